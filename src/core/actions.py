@@ -1,13 +1,170 @@
 """Centralized actions for sending to websockets."""
+from collections import defaultdict
+from contextlib import contextmanager
+import importlib
 import logging
+import threading
+import time
 
-from channels import Group
-from rest_framework.renderers import JSONRenderer
+from channels import Channel, Group
+from django.db import transaction
+
+from .renderers import SocketRenderer
 
 logger = logging.getLogger(__name__)
 
 STATUS_GROUP = 'status'
 
+# worker channel for unit changes that are sent to the status group in batches
+UNIT_BROADCAST_CHANNEL = 'x10.unit-broadcast'
+
+# how long a rendered list of all units or scenes can be reused, in seconds
+SET_CACHE_TTL = 1.0
+
+
+_RENDERER = SocketRenderer()
+
+_COMMAND_ENVELOPE = {'namespace': 'units', 'action': 'send_signal'}
+
+
+# core modules that import this one, loaded on first use
+_lazy_modules = {}
+
+
+def _core(name):
+    """Get a core module, importing it the first time it is needed.
+
+    The models import this module, so models and serializers cannot be imported at load time.
+    Caching the module skips the import machinery on every broadcast.
+
+    :param name: name of the module within the core app
+    """
+    module = _lazy_modules.get(name)
+    if module is None:
+        module = _lazy_modules[name] = importlib.import_module(f'core.{name}')
+    return module
+
+
+def _render(data):
+    """Render data to a JSON string using the shared renderer."""
+    return _RENDERER.render(data).decode('utf-8')
+
+
+# the person status only has two possible messages, render them once
+_PERSON_STATUS_TEXT = {
+    status: _render({
+        'namespace': 'person',
+        'action': 'arrive' if status else 'leave',
+        'payload': {'is_home': status}
+    }) for status in (True, False)
+}
+
+# rendered "set" messages for all units and scenes, shared across subscribers
+_units_cache = {'ts': 0, 'text': None}
+_scenes_cache = {'ts': 0, 'text': None}
+# rendered bootstrap messages for new sockets, one for each person status
+_bootstrap_cache = {status: {'ts': 0, 'text': None} for status in (True, False)}
+
+
+def _cached_text(cache, build):
+    """Get the cached message text, rebuilding it if it is missing or expired.
+
+    :param cache: one of the module-level message caches
+    :param build: function returning the rendered text
+    """
+    current = time.monotonic()
+    if cache['text'] is None or current - cache['ts'] >= SET_CACHE_TTL:
+        cache['text'] = build()
+        cache['ts'] = current
+    return cache['text']
+
+
+def _invalidate_bootstrap_cache():
+    """Clear the cached bootstrap messages."""
+    for cache in _bootstrap_cache.values():
+        cache['text'] = None
+
+
+def invalidate_units_cache():
+    """Clear the cached messages containing all units."""
+    _units_cache['text'] = None
+    _invalidate_bootstrap_cache()
+
+
+def invalidate_scenes_cache():
+    """Clear the cached messages containing all scenes."""
+    _scenes_cache['text'] = None
+    _invalidate_bootstrap_cache()
+
+
+def _group_pairs(pairs):
+    """Group (key, value) pairs into a dict of lists."""
+    grouped = defaultdict(list)
+    for key, value in pairs:
+        grouped[key].append(value)
+    return grouped
+
+
+def _unit_rows():
+    """Get all units as plain dicts, matching the output of UnitSerializer.
+
+    Columns and relation ids are read with values() so no model instances are created.
+    """
+    models = _core('models')
+    Unit = models.Unit
+
+    fields = [f.attname for f in Unit._meta.concrete_fields]
+    rows = list(Unit.objects.values(*fields))
+
+    relations = (
+        ('on_schedules', models.OnScheduleConstraint.objects
+            .order_by('schedule_id').values_list('unit_id', 'schedule_id')),
+        ('off_schedules', models.OffScheduleConstraint.objects
+            .order_by('schedule_id').values_list('unit_id', 'schedule_id')),
+        ('on_solar_schedules', models.OnSolarScheduleConstraint.objects
+            .order_by('solarschedule__event').values_list('unit_id', 'solarschedule_id')),
+        ('off_solar_schedules', models.OffSolarScheduleConstraint.objects
+            .order_by('solarschedule__event').values_list('unit_id', 'solarschedule_id')),
+    )
+    for name, pairs in relations:
+        related = _group_pairs(pairs)
+        for row in rows:
+            row[name] = related[row['id']]
+    return rows
+
+
+def _scene_rows():
+    """Get all scenes as plain dicts, matching the output of SceneSerializer.
+
+    Columns and unit slugs are read with values() so no model instances are created.
+    """
+    Scene = _core('models').Scene
+
+    rows = list(Scene.objects.values('id', 'name', 'slug'))
+    units = _group_pairs(Scene.units.through.objects
+                         .order_by('unit__order').values_list('scene_id', 'unit__slug'))
+    for row in rows:
+        row['units'] = units[row['id']]
+    return rows
+
+
+def _units_set_text(payload):
+    """Render the "set" message for a list of serialized units."""
+    return _render({
+        'namespace': 'units',
+        'action': 'set',
+        'payload': payload
+    })
+
+
+def _scenes_set_text(payload):
+    """Render the "set" message for a list of serialized scenes."""
+    return _render({
+        'namespace': 'scenes',
+        'action': 'set',
+        'payload': payload
+    })
+
 
 def send_command_status(unit, command, channel=None):
     """Send the unit signal to the websocket.
@@ -19,68 +176,137 @@ def send_command_status(unit, command, channel=None):
     if channel is None:
         channel = Group(STATUS_GROUP)
 
-    logger.debug(f'sending command {command} on {unit} to {channel}')
-    channel.send({
-        'text': JSONRenderer().render({
-            'namespace': 'units',
-            'action': 'send_signal',
-            'id': unit.slug,
-            'action': 'send_signal',
-            'payload': {'command': command}
-        }).decode('utf-8')
-    })
+    logger.debug('sending command %s on %s to %s', command, unit, channel)
+    msg = _COMMAND_ENVELOPE.copy()
+    msg['id'] = unit.slug
+    msg['payload'] = {'command': command}
+    channel.send({'text': _render(msg)})
+
+
+# units collected by batch_unit_broadcasts, for the current thread
+_broadcast_batch = threading.local()
 
 
-def send_unit_status(instance, created=False, channel=None):
-    """Send the serialized unit to the websocket.
+def _queue_units(units):
+    """Queue (pk, created) pairs for the broadcast worker once the transaction commits.
+
+    :param units: list of [pk, created] pairs
+    """
+    content = {'units': units}
+
+    def send():
+        channel = Channel(UNIT_BROADCAST_CHANNEL)
+        try:
+            # sent right away so a full layer is handled here, even from within a consumer
+            channel.send(content, immediately=True)
+        except channel.channel_layer.ChannelFull:
+            # a missed broadcast must never fail the save that caused it
+            logger.warning('broadcast channel is full, dropping update for %d units', len(units))
+
+    transaction.on_commit(send)
+
+
+@contextmanager
+def batch_unit_broadcasts():
+    """Queue all units saved within the block as a single message when the block exits.
+
+    Used around loops that signal several units, where each unit can take longer to send than
+    the broadcast worker waits for more updates.
+    """
+    if getattr(_broadcast_batch, 'units', None) is not None:
+        # already collecting in an outer block
+        yield
+        return
+
+    _broadcast_batch.units = {}
+    try:
+        yield
+    finally:
+        units, _broadcast_batch.units = _broadcast_batch.units, None
+        if units:
+            logger.debug('queueing batch of %d units for broadcast', len(units))
+            _queue_units([[pk, created] for pk, created in units.items()])
+
+
+def queue_unit_status(instance, created=False):
+    """Queue a unit to be sent to the websocket by a worker.
+
+    The message is only queued once the current transaction commits, so the worker reads the
+    saved row. Within batch_unit_broadcasts, the unit is queued when the block exits.
 
     :param instance: a Unit model instance
     :param created: if the unit was created
+    """
+    units = getattr(_broadcast_batch, 'units', None)
+    if units is not None:
+        units[instance.pk] = units.get(instance.pk, False) or created
+        return
+
+    logger.debug('queueing unit %s for broadcast', instance)
+    _queue_units([[instance.pk, created]])
+
+
+def queue_units_status(pks):
+    """Queue several saved units to be sent to the websocket by a worker.
+
+    :param pks: primary keys of the units
+    """
+    units = getattr(_broadcast_batch, 'units', None)
+    if units is not None:
+        for pk in pks:
+            units.setdefault(pk, False)
+        return
+
+    logger.debug('queueing units %s for broadcast', pks)
+    _queue_units([[pk, False] for pk in pks])
+
+
+def send_units_batch(qs, created=(), channel=None):
+    """Send several serialized units to the websocket in a single message.
+
+    :param qs: a queryset for Units
+    :param created: primary keys of the units that were created
     :param channel: an outgoing reply channel, defaults to the entire group
     """
     if channel is None:
         channel = Group(STATUS_GROUP)
 
-    from core.serializers import UnitSerializer  # noqa
-    serializer = UnitSerializer(instance)
+    rows = _core('serializers').UnitSerializer(qs, many=True).data
 
-    logger.debug(f'sending unit {instance} to {channel}')
+    logger.debug('sending batch of %d units to %s', len(rows), channel)
     channel.send({
-        'text': JSONRenderer().render({
+        'text': _render({
             'namespace': 'units',
-            'action': 'post_save',
-            'id': instance.slug,
-            'created': created,
-            'payload': serializer.data
-        }).decode('utf-8')
+            'action': 'batch',
+            'payload': [{
+                'id': row['slug'],
+                'created': row['id'] in created,
+                'payload': row
+            } for row in rows]
+        })
     })
 
 
 def send_units_status(qs=None, channel=None):
     """Send all serialized units to the websocket.
 
+    The message for all instances is cached for SET_CACHE_TTL seconds, or until a unit is saved.
+
     :param qs: a queryset for Units, defaults to all instances
     :param channel: an outgoing reply channel, defaults to the entire group
     """
     if channel is None:
         channel = Group(STATUS_GROUP)
 
-    from core.serializers import UnitSerializer  # noqa
-
     if qs is None:
-        from core.models import Unit  # noqa
-        qs = Unit.objects.all()
+        text = _cached_text(_units_cache, lambda: _units_set_text(_unit_rows()))
+        logger.debug('sending all units to %s', channel)
+    else:
+        rows = _core('serializers').UnitSerializer(qs, many=True).data
+        text = _units_set_text(rows)
+        logger.debug('sending %d units to %s', len(rows), channel)
 
-    serializer = UnitSerializer(qs, many=True)
-
-    logger.debug(f'sending all {len(qs)} units to {channel}')
-    channel.send({
-        'text': JSONRenderer().render({
-            'namespace': 'units',
-            'action': 'set',
-            'payload': serializer.data
-        }).decode('utf-8')
-    })
+    channel.send({'text': text})
 
 
 def send_scene_status(instance, created=False, channel=None):
@@ -93,45 +319,40 @@ def send_scene_status(instance, created=False, channel=None):
     if channel is None:
         channel = Group(STATUS_GROUP)
 
-    from core.serializers import SceneSerializer  # noqa
-    serializer = SceneSerializer(instance)
+    data = _core('serializers').SceneSerializer(instance).data
 
-    logger.debug(f'sending scene {instance} state to {channel}')
+    logger.debug('sending scene %s state to %s', instance, channel)
     channel.send({
-        'text': JSONRenderer().render({
+        'text': _render({
             'namespace': 'scenes',
             'action': 'post_save',
             'id': instance.slug,
             'created': created,
-            'payload': serializer.data
-        }).decode('utf-8')
+            'payload': data
+        })
     })
 
 
 def send_scenes_status(qs=None, channel=None):
     """Send all serialized scenes to the websocket.
 
+    The message for all instances is cached for SET_CACHE_TTL seconds, or until a scene is saved.
+
     :param qs: a queryset for Scenes, defaults to all instances
     :param channel: an outgoing reply channel, defaults to the entire group
     """
     if channel is None:
         channel = Group(STATUS_GROUP)
 
-    from core.serializers import SceneSerializer  # noqa
     if qs is None:
-        from core.models import Scene  # noqa
-        qs = Scene.objects.all()
-
-    serializer = SceneSerializer(qs, many=True)
+        text = _cached_text(_scenes_cache, lambda: _scenes_set_text(_scene_rows()))
+        logger.debug('sending all scenes to %s', channel)
+    else:
+        rows = _core('serializers').SceneSerializer(qs, many=True).data
+        text = _scenes_set_text(rows)
+        logger.debug('sending %d scenes to %s', len(rows), channel)
 
-    logger.debug(f'sending all {len(qs)} scenes to {channel}')
-    channel.send({
-        'text': JSONRenderer().render({
-            'namespace': 'scenes',
-            'action': 'set',
-            'payload': serializer.data
-        }).decode('utf-8')
-    })
+    channel.send({'text': text})
 
 
 def send_real_person_status(status=None, channel=None):
@@ -144,14 +365,33 @@ def send_real_person_status(status=None, channel=None):
         channel = Group(STATUS_GROUP)
 
     if status is None:
-        from core.models import RealPerson  # noqa
-        status = RealPerson.is_home()
+        status = _core('models').RealPerson.is_home()
 
-    logger.debug(f'sending state of real person to {channel}: {status}')
-    channel.send({
-        'text': JSONRenderer().render({
-            'namespace': 'person',
-            'action': 'arrive' if status else 'leave',
-            'payload': {'is_home': status}
-        }).decode('utf-8')
-    })
+    logger.debug('sending state of real person to %s: %s', channel, status)
+    channel.send({'text': _PERSON_STATUS_TEXT[bool(status)]})
+
+
+def send_initial_state(channel):
+    """Send the person status, all units, and all scenes in a single message.
+
+    Used when a socket first connects so the client can be populated with one frame instead of
+    a separate message for each namespace. The message is cached like the lists of all units
+    and scenes, with a separate copy for each person status.
+
+    :param channel: an outgoing reply channel
+    """
+    is_home = bool(_core('models').RealPerson.is_home())
+
+    def build():
+        return _render({
+            'namespace': 'bootstrap',
+            'action': 'set',
+            'payload': {
+                'person': {'is_home': is_home},
+                'units': _unit_rows(),
+                'scenes': _scene_rows()
+            }
+        })
+
+    logger.debug('sending initial state to %s', channel)
+    channel.send({'text': _cached_text(_bootstrap_cache[is_home], build)})
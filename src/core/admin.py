@@ -1,12 +1,11 @@
 """Admin panel options for core app."""
 from adminsortable2.admin import SortableAdminMixin
-from django.contrib import admin, messages
+from django.contrib import admin
 
-from x10.interface import FirecrackerException
-from x10.lock import CacheLockException
 from . models import (OffScheduleConstraint, OffSolarScheduleConstraint,
                       OnScheduleConstraint, OnSolarScheduleConstraint,
                       PersistentToken, Scene, Schedule, SolarSchedule, Unit)
+from .tasks import run_group
 
 
 class OnScheduleConstraintInline(admin.TabularInline):
@@ -77,24 +76,11 @@ class UnitAdmin(SortableAdminMixin, admin.ModelAdmin):
     """Model options for Unit models."""
 
     def _action(self, request, queryset, action):
-        """Run an admin action on a set of units."""
-        success = []
-        fail = []
-        for unit in queryset.all():
-            try:
-                unit.send_signal(action)
-            except (CacheLockException, FirecrackerException):
-                fail.append(str(unit.slug))
-            else:
-                success.append(str(unit.slug))
-        if len(success):
-            success = ', '.join(success)
-            self.message_user(request, f'Sent task to turn {action} units: {success}')
-        if len(fail):
-            fail = ', '.join(fail)
-            self.message_user(request,
-                              f'Could not send task to turn {action} units: {fail}',
-                              level=messages.ERROR)
+        """Queue an admin action on a set of units."""
+        slugs = list(queryset.values_list('slug', flat=True))
+        run_group(slugs, action)
+        slugs = ', '.join(slugs)
+        self.message_user(request, f'Sent task to turn {action} units: {slugs}')
 
     def turn_on(self, request, queryset):
         """Admin action to turn on units."""
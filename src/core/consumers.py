@@ -3,26 +3,30 @@ import json
 
 from channels import Group
 from channels.auth import channel_session_user, channel_session_user_from_http
-from rest_framework.renderers import JSONRenderer
 
-from .actions import send_real_person_status, send_scenes_status, send_units_status, STATUS_GROUP
+from .actions import _RENDERER, send_initial_state, send_units_status, STATUS_GROUP
+
+
+def _error_text(error):
+    """Render an error message for a socket."""
+    return _RENDERER.render({'error': error}).decode('utf-8')
+
+
+# error messages never change, render them once
+_FORBIDDEN_TEXT = _error_text(403)
+_PARSE_ERROR_TEXT = _error_text('unable to parse JSON message')
+_UNKNOWN_ACTION_TEXT = _error_text('unknown action')
 
 
 @channel_session_user_from_http
 def ws_connect(message):
     """Add only authenticated users to the channel group."""
-    if message.user.is_authenticated():
+    if message.user.is_authenticated:
         message.reply_channel.send({'accept': True})
-        send_real_person_status(channel=message.reply_channel)
-        send_units_status(channel=message.reply_channel)
-        send_scenes_status(channel=message.reply_channel)
+        send_initial_state(message.reply_channel)
         Group(STATUS_GROUP).add(message.reply_channel)
     else:
-        message.reply_channel.send({
-            'text': JSONRenderer().render({
-                'error': 403
-            }).decode('utf-8')
-        })
+        message.reply_channel.send({'text': _FORBIDDEN_TEXT})
         message.reply_channel.send({'close': True})
 
 
@@ -32,21 +36,13 @@ def ws_receive(message):
     try:
         data = json.loads(message.content['text'])
     except json.JSONDecodeError:
-        message.reply_channel.send({
-            'text': JSONRenderer().render({
-                'error': 'unable to parse JSON message'
-            }).decode('utf-8')
-        })
+        message.reply_channel.send({'text': _PARSE_ERROR_TEXT})
     else:
         if 'action' in data:
             if data['action'] == 'status':
                 send_units_status(channel=message.reply_channel)
             else:
-                message.reply_channel.send({
-                    'text': JSONRenderer().render({
-                        'error': 'unknown action'
-                    }).decode('utf-8')
-                })
+                message.reply_channel.send({'text': _UNKNOWN_ACTION_TEXT})
 
 
 @channel_session_user
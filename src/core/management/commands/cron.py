@@ -1,5 +1,7 @@
 """Command to run cron-based schedules."""
 import datetime
+import heapq
+import itertools
 import logging
 import time
 
@@ -25,7 +27,7 @@ class Command(BaseCommand):
         """Add arguments to the command."""
         parser.add_argument(
             '-i', '--interval',
-            help='How often the schedules should be checked, in seconds',
+            help='How often the schedules should be reloaded, in seconds',
             type=int,
             default=5 * 60)
 
@@ -47,57 +49,91 @@ class Command(BaseCommand):
         # used only for logging times
         self.tz = pytz.timezone(settings.TIME_ZONE)
 
+        # tie breaker so entries with the same time never compare constraints
+        self.counter = itertools.count()
+
+        queue = []
+        reload_time = None
         while True:
             current_time = now()
-            logger.debug(f'starting check at {current_time.astimezone(self.tz)}')
-
-            # if a person is not home, exclude the schedules that require someone to be home
-            qs_filter = {}
-            if not RealPerson.is_home():
-                qs_filter['if_home'] = True
-
-            # get all of the on schedules
-            on_constraints = OnScheduleConstraint.objects.exclude(**qs_filter)
-            off_constraints = OffScheduleConstraint.objects.exclude(**qs_filter)
-
-            self.run_actions(on_constraints, current_time, Unit.ON_ACTION)
-            self.run_actions(off_constraints, current_time, Unit.OFF_ACTION)
-
-            # get the duration of the loop
-            finish_time = now()
-            duration = finish_time - current_time
-            logger.debug(f'loop duration was {duration}')
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('starting check at %s', current_time.astimezone(self.tz))
+
+            # collect every event that is due and queue the following occurrence, skipping any
+            # occurrences missed while behind so each constraint runs at most once per check
+            due = []
+            while queue and queue[0][0] <= current_time:
+                event_time, _, c, action = heapq.heappop(queue)
+                due.append((c, action))
+                start_time = max(event_time, current_time)
+                self.push(queue, c.schedule.next_time(start_time), c, action, after=start_time)
+
+            # check if someone is home once for all of the due events
+            if due:
+                is_home = any(c.if_home for c, _ in due) and RealPerson.is_home()
+                for c, action in due:
+                    self.run_action(c, action, is_home)
+
+            # reload the constraints every interval to pick up any changes
+            if reload_time is None or current_time >= reload_time:
+                queue = self.build_queue(current_time)
+                reload_time = current_time + self.delta
+
+            # sleep until the next event or reload, whichever is first
+            wake_time = min(queue[0][0], reload_time) if queue else reload_time
+            wait_sec = max(0, (wake_time - now()).total_seconds())
+            logger.debug('sleeping %s seconds...', wait_sec)
+            time.sleep(wait_sec)
 
-            # schedule the next loop to run to stay within the interval time
-            wait_sec = interval - duration.total_seconds()
-            if duration.total_seconds() > interval:
-                logger.warning(f'execution time exceeds interval, skipping next loop')
-                wait_sec += interval
+    def push(self, queue, event_time: datetime, constraint, action: str, after: datetime = None):
+        """Add an event to the queue.
 
-            # sleep until the next loop
-            logger.debug(f'sleeping {wait_sec} seconds...')
-            time.sleep(wait_sec)
+        :param queue: the heap of queued events
+        :param event_time: when the event should run
+        :param constraint: the schedule constraint for the event
+        :param action: the command to be sent
+        :param after: if given, the event is dropped unless it is later than this time
+        """
+        # a time that does not move forward would keep the event due forever
+        if after is not None and event_time <= after:
+            logger.warning('%s next event time for %s is not after %s, dropping it until reload',
+                           constraint.schedule, constraint.unit, after)
+            return
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s next event time for %s is at %s', constraint.schedule,
+                         constraint.unit, event_time.astimezone(self.tz))
+        heapq.heappush(queue, (event_time, next(self.counter), constraint, action))
+
+    def build_queue(self, current_time: datetime):
+        """Create a heap of the next event time for every schedule constraint.
+
+        :param current_time: the current time to calculate the next event times
+        :returns: the heap of queued events
+        """
+        queue = []
+        for model, action in ((OnScheduleConstraint, Unit.ON_ACTION),
+                              (OffScheduleConstraint, Unit.OFF_ACTION)):
+            for c in model.objects.select_related('schedule', 'unit'):
+                self.push(queue, c.schedule.next_time(current_time), c, action)
+        return queue
 
-    def run_actions(self, constraints, current_time: datetime, action: str):
-        """Run actions for a set of schedule constraints.
+    def run_action(self, constraint, action: str, is_home: bool):
+        """Run the action for a schedule constraint.
 
-        :param constraints: the queryset of schedule constraints to loop through
-        :param current_time: the current time to calculate the next event time
+        :param constraint: the schedule constraint that is due
         :param action: the command to be sent
+        :param is_home: if someone is home
         """
-        for c in constraints:
-            # get the next event time for the schedule
-            event_time = c.schedule.next_time(current_time)
-            logger.debug(f'{c.schedule} next event time is at {event_time.astimezone(self.tz)}')
-
-            # get the next time the loop will run
-            next_run = current_time + self.delta
-            logger.debug(f'next run is at {next_run.astimezone(self.tz)}')
-
-            if next_run > event_time:
-                # the next time the loop will run exceeds the next scheduled time, run now
-                logger.info(f'turning {c.unit} {action}')
-                try:
-                    c.unit.send_signal(action)
-                except (CacheLockException, FirecrackerException) as e:
-                    logger.exception(e)
+        # skip schedules that require someone to be home
+        if constraint.if_home and not is_home:
+            logger.debug('nobody is home, skipping %s', constraint)
+            return
+
+        logger.info('turning %s %s', constraint.unit, action)
+        try:
+            # the unit may have changed since the constraints were loaded
+            constraint.unit.refresh_from_db()
+            constraint.unit.send_signal(action)
+        except (CacheLockException, FirecrackerException) as e:
+            logger.exception(e)
@@ -8,8 +8,10 @@ from django.core.management.base import BaseCommand
 from django.utils.timezone import now
 import pytz
 
-from core.models import OffSolarScheduleConstraint, OnSolarScheduleConstraint, RealPerson, Unit
-from x10.interface import FirecrackerException
+from core.actions import (batch_unit_broadcasts, invalidate_units_cache, queue_units_status,
+                          send_command_status)
+from core.models import (OffSolarScheduleConstraint, OnSolarScheduleConstraint, RealPerson,
+                         SolarSchedule, Unit)
 from x10.lock import CacheLockException
 
 
@@ -25,7 +27,7 @@ class Command(BaseCommand):
         """Add arguments to the command."""
         parser.add_argument(
             '-i', '--interval',
-            help='How often the schedules should be checked, in seconds',
+            help='How often the schedules should be reloaded, in seconds',
             type=int,
             default=5 * 60)
 
@@ -47,58 +49,99 @@ class Command(BaseCommand):
         # used only for logging times
         self.tz = pytz.timezone(settings.TIME_ZONE)
 
+        upcoming = {}
+        reload_time = None
         while True:
             current_time = now()
-            logger.debug(f'starting check at {current_time.astimezone(self.tz)}')
-
-            # if a person is not home, exclude the schedules that require someone to be home
-            qs_filter = {}
-            if not RealPerson.is_home():
-                qs_filter['if_home'] = True
-
-            # get all of the on schedules
-            on_constraints = OnSolarScheduleConstraint.objects.exclude(**qs_filter)
-            off_constraints = OffSolarScheduleConstraint.objects.exclude(**qs_filter)
-
-            self.run_actions(on_constraints, current_time, Unit.ON_ACTION)
-            self.run_actions(off_constraints, current_time, Unit.OFF_ACTION)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('starting check at %s', current_time.astimezone(self.tz))
+
+            # run every schedule that is due, then get the time of its following event
+            due = [schedule for schedule, event_time in upcoming.items()
+                   if event_time <= current_time]
+            if due:
+                self.run_schedules(due)
+                for schedule in due:
+                    upcoming[schedule] = self.next_event(schedule, upcoming[schedule])
+
+            # reload the schedules every interval to pick up any changes
+            if reload_time is None or current_time >= reload_time:
+                upcoming = {schedule: self.next_event(schedule, current_time)
+                            for schedule in SolarSchedule.objects.all()}
+                reload_time = current_time + self.delta
+
+            # sleep until the next event or reload, whichever is first
+            wake_time = min([reload_time, *upcoming.values()])
+            wait_sec = max(0, (wake_time - now()).total_seconds())
+            logger.debug('sleeping %s seconds...', wait_sec)
+            time.sleep(wait_sec)
 
-            # get the duration of the loop
-            finish_time = now()
-            duration = finish_time - current_time
-            logger.debug(f'loop duration was {duration}')
+    def next_event(self, schedule, current_time: datetime):
+        """Get the next event time for a solar schedule.
 
-            # schedule the next loop to run to stay within the interval time
-            wait_sec = interval - duration.total_seconds()
-            if duration.total_seconds() > interval:
-                logger.warning(f'execution time exceeds interval, skipping next loop')
-                wait_sec += interval
+        :param schedule: the solar schedule
+        :param current_time: the time to calculate the next event from
+        :returns: next event time, in UTC
+        """
+        event_time = schedule.next_time(current_time)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s next event time is at %s', schedule, event_time.astimezone(self.tz))
+        return event_time
 
-            # sleep until the next loop
-            logger.debug(f'sleeping {wait_sec} seconds...')
-            time.sleep(wait_sec)
+    def run_schedules(self, schedules):
+        """Run the actions for every constraint of the given solar schedules.
 
-    def run_actions(self, constraints, current_time: datetime, action: str):
+        :param schedules: the solar schedules with an event that is due
+        """
+        # if a person is not home, exclude the schedules that require someone to be home
+        qs_filter = {}
+        if not RealPerson.is_home():
+            qs_filter['if_home'] = True
+
+        on_constraints = (OnSolarScheduleConstraint.objects
+                          .filter(solarschedule__in=schedules).exclude(**qs_filter))
+        off_constraints = (OffSolarScheduleConstraint.objects
+                           .filter(solarschedule__in=schedules).exclude(**qs_filter))
+
+        # send the new unit states out together once all signals are sent
+        with batch_unit_broadcasts():
+            self.run_actions(on_constraints, Unit.ON_ACTION)
+            self.run_actions(off_constraints, Unit.OFF_ACTION)
+
+    def run_actions(self, constraints, action: str):
         """Run actions for a set of schedule constraints.
 
+        Only the unit columns needed to send the signal are loaded, and all signals are sent
+        while holding the interface lock once. The command is sent to the websocket for each unit
+        that was switched, the same as any other signal, and the new state of the units is saved
+        with a single update afterwards.
+
         :param constraints: the queryset of schedule constraints to loop through
-        :param current_time: the current time to calculate the next event time
         :param action: the command to be sent
         """
-        for c in constraints:
-            # get the next event time for the schedule
-            event_time = c.solarschedule.next_time(current_time)
-            logger.debug((f'{c.solarschedule} next event time is at '
-                          f'{event_time.astimezone(self.tz)}'))
-
-            # get the next time the loop will run
-            next_run = current_time + self.delta
-            logger.debug(f'next run is at {next_run.astimezone(self.tz)}')
-
-            if next_run > event_time:
-                # the next time the loop will run exceeds the next scheduled time, run now
-                logger.info(f'turning {c.unit} {action}')
-                try:
-                    c.unit.send_signal(action)
-                except (CacheLockException, FirecrackerException) as e:
-                    logger.exception(e)
+        rows = list(constraints.values_list('unit_id', 'unit__name', 'unit__slug', 'unit__house',
+                                            'unit__number'))
+        if not rows:
+            return
+
+        commands = []
+        for _, name, _, house, number in rows:
+            logger.info('turning %s %s', name, action)
+            commands.append((house, number, action))
+
+        try:
+            sent = Unit.dispatch_signals(commands)
+        except CacheLockException as e:
+            logger.exception(e)
+            return
+
+        fired = []
+        for (unit_id, name, slug, _, _), was_sent in zip(rows, sent):
+            if was_sent:
+                send_command_status(Unit(id=unit_id, name=name, slug=slug), action)
+                fired.append(unit_id)
+
+        if fired:
+            Unit.objects.filter(pk__in=fired).update(state=action == Unit.ON_ACTION)
+            invalidate_units_cache()
+            queue_units_status(fired)
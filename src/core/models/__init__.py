@@ -12,7 +12,7 @@ from .solar_schedule import *  # noqa
 from .unit import *  # noqa
 
 
-@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='core.create_auth_token')
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     """Automatically create auth tokens for users."""
     if created:
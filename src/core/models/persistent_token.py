@@ -1,6 +1,5 @@
 """Models related to auth tokens."""
-import binascii
-import os
+import secrets
 
 from django.conf import settings
 from django.db import models
@@ -30,7 +29,7 @@ class PersistentToken(models.Model):
 
     def generate_key(self):
         """Create a random key."""
-        return binascii.hexlify(os.urandom(20)).decode()
+        return secrets.token_hex(20)
 
     def __str__(self):
         """Use key as a string representation."""
@@ -9,6 +9,7 @@ __all__ = ('RealPerson',)
 class RealPerson(object):
     """Represent a physical person being in the home."""
 
+    __slots__ = ()
     KEY = 'person_in_home'
 
     @staticmethod
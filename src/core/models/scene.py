@@ -2,7 +2,8 @@
 from django.db import models
 from django.db.models.signals import post_save
 
-from core.actions import send_scene_status
+from core.actions import invalidate_scenes_cache, send_scene_status
+from x10.interface import FirecrackerException
 from .unit import Unit
 
 __all__ = ('Scene',)
@@ -31,24 +32,34 @@ class Scene(models.Model):
     @staticmethod
     def post_save(sender, instance=None, created=False, **kwargs):
         """Send the serialized instance out to the websocket."""
+        invalidate_scenes_cache()
         send_scene_status(instance, created)
 
     def send_signal(self, command: str=None, multiplier: int=1, attempts: int=10,
-                    sleep_time: float=0.5):
+                    sleep_time: float=1.0):
         """Send the signal to all of the units in the scene.
 
-        :param command: the command to send to each unit
+        The command is validated for every unit before anything is sent, then all units are sent
+        their command while holding the interface lock once. The new states are saved with an
+        update instead of saving each unit.
+
+        :param command: the command to send to each unit, defaults to the state of each unit
         :param multiplier: the number of times to send the command to each unit
         :param attempts: max number of attempts to try grabbing the lock
-        :param sleep_time: how long to wait before checking the lock again
+        :param sleep_time: the longest time to wait before checking the lock again
         :raises: CacheLockException
+        :raises: FirecrackerException: if none of the commands could be sent
         :raises: InvalidSignalError
         :returns: the status if all the command were sent
         """
-        status = True
-        for unit in self.units.all():
-            status = status and unit.send_signal(command, multiplier, attempts, sleep_time)
-        return status
+        units = list(self.units.only('name', 'slug', 'house', 'number', 'state', 'dimmable'))
+        if not units:
+            return True
+
+        sent = Unit.send_signals(units, command, multiplier, attempts, sleep_time)
+        if not any(sent):
+            raise FirecrackerException(f'no commands could be sent to scene "{self}"')
+        return all(sent)
 
 
 post_save.connect(Scene.post_save, sender=Scene)
@@ -1,5 +1,6 @@
 """Models related to Schedules."""
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 from crontab import CronTab
 from django.conf import settings
@@ -11,6 +12,18 @@ import pytz
 __all__ = ('Schedule',)
 
 
+@lru_cache(maxsize=256)
+def _crontab(entry: str):
+    """Parse a crontab entry.
+
+    Parsed entries are cached by their text, so editing a schedule simply parses the new text.
+
+    :param entry: crontab entry
+    :returns: crontab object
+    """
+    return CronTab(entry)
+
+
 class Schedule(models.Model):
     """Model to represent and calculate times for crontab-based events."""
 
@@ -37,33 +50,28 @@ class Schedule(models.Model):
         super(Schedule, self).clean(*args, **kwargs)
 
     def calendar(self):
-        """Create a CronTab for the event.
+        """Get the parsed CronTab for the event.
 
         :returns: crontab object
         """
-        return CronTab(self.crontab)
+        return _crontab(self.crontab)
 
-    def next_time(self, current_time: datetime = now()):
+    def next_time(self, current_time: datetime = None):
         """Get the next time of the event based on the current time.
 
         The crontab is assumed to be in local time, so the timezone will be converted back
         to UTC.
 
-        :param current_time: timezone-aware starting time
+        :param current_time: timezone-aware starting time, defaults to now
         :returns: next event time, in UTC
         """
-        # ensure the input time is in utc
-        current_time = current_time.astimezone(pytz.utc)
-
-        # get the crontab object
-        cal = self.calendar()
-
-        # calculate the next delta time to the next event
-        delta = timedelta(seconds=cal.next(current_time))
-        next_time = current_time + delta
+        if current_time is None:
+            current_time = now()
 
-        # get the local timezone
+        # the crontab is in local time, so find the next local wall clock time
         local_tz = pytz.timezone(settings.TIME_ZONE)
+        local_time = current_time.astimezone(local_tz).replace(tzinfo=None)
+        delta = timedelta(seconds=self.calendar().next(local_time, default_utc=False))
 
-        # assume the crontab is in local time, then convert to utc
-        return next_time.replace(tzinfo=local_tz).astimezone(pytz.utc)
+        # localize picks the right offset for that date (replace would use LMT), then convert
+        return local_tz.localize(local_time + delta).astimezone(pytz.utc)
@@ -1,5 +1,7 @@
 """Models related to SolarSchedules."""
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+import threading
 
 from django.conf import settings
 from django.db import models
@@ -9,6 +11,67 @@ import pytz
 
 __all__ = ('SolarSchedule',)
 
+# observers keyed by horizon and location, they are reused for every computation
+_observers = {}
+# ephem moves the observer date while searching for an event, so only one search at a time
+_observer_lock = threading.Lock()
+# the sun is only computed while holding the observer lock, so one body is shared
+_SUN = ephem.Sun()
+# last search for each event and location, as (start time, event time)
+_last_events = {}
+# searches from different start times can differ slightly, don't reuse results this close
+_EVENT_PRECISION = timedelta(seconds=1)
+
+
+def _observer(horizon: str, lat: str, lon: str):
+    """Get the shared observer at sea level with no atmospheric refraction.
+
+    The observer is created on first use. It must not be modified by callers.
+
+    :param horizon: altitude of the horizon for the event
+    :param lat: latitude of the observer
+    :param lon: longitude of the observer
+    :returns: observer calendar
+    """
+    key = (horizon, lat, lon)
+    cal = _observers.get(key)
+    if cal is None:
+        cal = ephem.Observer()
+        cal.lat = lat
+        cal.lon = lon
+        cal.elev = 0
+        cal.horizon = horizon
+        cal.pressure = 0
+        _observers[key] = cal
+    return cal
+
+
+@lru_cache(maxsize=256)
+def _compute_next(event: str, lat: str, lon: str, start: datetime):
+    """Compute the next time of a solar event.
+
+    Results are cached since every schedule and unit sharing the event asks for the same time.
+
+    :param event: key of the event in SolarSchedule.EVENT_SPECS
+    :param lat: latitude of the observer
+    :param lon: longitude of the observer
+    :param start: starting time, in UTC
+    :returns: next event time, in UTC
+    """
+    method, horizon, use_center = SolarSchedule.EVENT_SPECS[event]
+
+    with _observer_lock:
+        cal = _observer(horizon, lat, lon)
+
+        # call the function
+        if use_center:
+            next_time = method(cal, _SUN, start=start, use_center=True)
+        else:
+            next_time = method(cal, _SUN, start=start)
+
+    # convert to utc datetime
+    return next_time.datetime().replace(tzinfo=pytz.utc)
+
 
 class SolarSchedule(models.Model):
     """Model to represent and calculate times for solar events."""
@@ -52,6 +115,10 @@ class SolarSchedule(models.Model):
             'use_center': True},
     }
     EVENT_CHOICES = [(key, ' '.join(key.split('_')).title()) for key in EVENTS.keys()]
+    EVENT_DISPLAY = dict(EVENT_CHOICES)
+    # observer method, horizon, and use_center flag for each event
+    EVENT_SPECS = {key: (getattr(ephem.Observer, event['method']), event['horizon'],
+                         event['use_center']) for key, event in EVENTS.items()}
 
     class Meta:
         """Model options."""
@@ -66,41 +133,47 @@ class SolarSchedule(models.Model):
 
     def __str__(self):
         """Use event text when converting to string."""
-        return self.get_event_display()
+        return SolarSchedule.EVENT_DISPLAY.get(self.event, self.event)
 
     def calendar(self):
-        """Create a calendar for the event.
+        """Get the shared calendar for the event.
 
         :returns: observer calendar
         """
-        cal = ephem.Observer()
-        cal.lat = str(settings.X10_LATITUDE)
-        cal.lon = str(settings.X10_LONGITUDE)
-        cal.elev = 0
-        cal.horizon = SolarSchedule.EVENTS[self.event]['horizon']
-        cal.pressure = 0
-        return cal
+        return _observer(SolarSchedule.EVENT_SPECS[self.event][1],
+                         str(settings.X10_LATITUDE), str(settings.X10_LONGITUDE))
 
-    def next_time(self, current_time: datetime = now()):
+    def next_time(self, current_time: datetime = None):
         """Get the next time of the event based on the current time.
 
-        :param current_time: timezone-aware starting time
+        The last result for each event is reused for any time between the start of that search
+        and shortly before the event, since no other occurrence can fall in between. Otherwise
+        times are computed from the start of the minute so they can be shared between calls.
+        Events within the current minute are computed from the exact time instead.
+
+        :param current_time: timezone-aware starting time, defaults to now
         :returns: next event time, in UTC
         """
-        # get the event details and calendar
-        event = SolarSchedule.EVENTS[self.event]
-        cal = self.calendar()
+        if current_time is None:
+            current_time = now()
+
+        lat = str(settings.X10_LATITUDE)
+        lon = str(settings.X10_LONGITUDE)
 
         # ensure the input time is in utc
-        current_time = current_time.astimezone(pytz.utc)
+        if current_time.tzinfo is not pytz.utc:
+            current_time = current_time.astimezone(pytz.utc)
 
-        # call the function
-        func = getattr(cal, event['method'])
-        if event['use_center']:
-            next_time = func(ephem.Sun(), start=current_time, use_center=True)
-        else:
-            next_time = func(ephem.Sun(), start=current_time)
+        key = (self.event, lat, lon)
+        last = _last_events.get(key)
+        if last is not None and last[0] <= current_time < last[1] - _EVENT_PRECISION:
+            return last[1]
+
+        minute = current_time.replace(second=0, microsecond=0)
+        next_utc = _compute_next(self.event, lat, lon, minute)
+        if next_utc < minute + timedelta(minutes=1):
+            # the event is within this minute, it may have already passed
+            next_utc = _compute_next(self.event, lat, lon, current_time)
 
-        # convert to utc datetime
-        next_utc = next_time.datetime().replace(tzinfo=pytz.utc)
+        _last_events[key] = (current_time, next_utc)
         return next_utc
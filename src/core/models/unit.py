@@ -1,6 +1,10 @@
 """Models related to Units."""
+from bisect import bisect_left
+from collections import Counter, defaultdict
 from datetime import datetime
+import heapq
 import logging
+from operator import itemgetter
 
 from django.conf import settings
 from django.db import models
@@ -8,8 +12,10 @@ from django.db.models.signals import post_save
 from django.utils.timezone import now
 import pytz
 
-from core.actions import send_command_status, send_unit_status
-from x10.interface import HOUSE_LABELS, send_command, UNIT_LABELS
+from core.actions import (invalidate_units_cache, queue_unit_status, queue_units_status,
+                          send_command_status)
+from x10.interface import (build_command, FirecrackerException, HOUSE_LABELS, send_commands,
+                           UNIT_LABELS)
 from x10.lock import cache_lock
 from .schedule import Schedule
 from .solar_schedule import SolarSchedule
@@ -29,8 +35,8 @@ class InvalidSignalError(Exception):
 class Unit(models.Model):
     """Model to represent a receiver in an X10 home."""
 
-    HOUSE_CHOICES = [(h.upper(), h.upper()) for h in HOUSE_LABELS]
-    NUMBER_CHOICES = [(n, str(n)) for n in UNIT_LABELS]
+    HOUSE_CHOICES = tuple((h, h) for h in (label.upper() for label in HOUSE_LABELS))
+    NUMBER_CHOICES = tuple((n, str(n)) for n in UNIT_LABELS)
 
     ON_ACTION = 'on'
     OFF_ACTION = 'off'
@@ -42,7 +48,8 @@ class Unit(models.Model):
         (BRIGHT_ACTION, 'Bright'),
         (DIM_ACTION, 'Dim'),
     )
-    ACTION_COMMANDS = [a for a, _ in ACTION_CHOICES]
+    ACTION_COMMANDS = frozenset(a for a, _ in ACTION_CHOICES)
+    DIMMER_COMMANDS = frozenset((BRIGHT_ACTION, DIM_ACTION))
 
     class Meta:
         """Model options."""
@@ -106,7 +113,7 @@ class Unit(models.Model):
         return self.name
 
     def send_signal(self, command: str=None, multiplier: int=1, attempts: int=10,
-                    sleep_time: float=0.5):
+                    sleep_time: float=1.0, persist: bool=True):
         """Send a signal to the unit.
 
         This uses a lock to prevent multiple messages from being sent at once. A command can be
@@ -115,36 +122,25 @@ class Unit(models.Model):
         :param command: the command to send to the unit
         :param multiplier: the number of times to send the command
         :param attempts: max number of attempts to try grabbing the lock
-        :param sleep_time: how long to wait before checking the lock again
+        :param sleep_time: the longest time to wait before checking the lock again
+        :param persist: save the new state; when False, only the instance is updated and the
+                        caller is responsible for saving it
         :raises: CacheLockException
         :raises: InvalidSignalError
         :returns: the status if the command was sent
         """
-        logger.debug(f'sending signal "{command}" {multiplier} time(s) to unit "{self}"')
+        logger.debug('sending signal "%s" %s time(s) to unit "%s"', command, multiplier, self)
         status = True
 
         # no command given, resend the current state
         if command is None:
             command = Unit.ON_ACTION if self.state else Unit.OFF_ACTION
-            logger.debug(f'using default action "{command}"')
+            logger.debug('using default action "%s"', command)
 
-        # check if the command was valid
-        command = command.lower()
-        if command not in Unit.ACTION_COMMANDS:
-            logger.error(f'invalid command: "{command}"')
-            raise InvalidSignalError(f'the command "{command}" does not exist')
-
-        # only allow bright or dim actions if the unit is dimmable
-        if (command == Unit.BRIGHT_ACTION or command == Unit.DIM_ACTION) and not self.dimmable:
-            logger.error(f'"{self}" does not support the command: {command}')
-            raise InvalidSignalError(f'the "{command}" command cannot be sent to this device')
+        command = Unit.clean_command(command, self.dimmable)
 
         # grab the lock and send the signal
-        with cache_lock('x10_interface', attempts, sleep_time):
-            for i in range(0, multiplier):
-                logger.debug((f'sending signal "{command}" on "{settings.X10_SERIAL}" '
-                              f'to unit "{self.number}" in house "{self.house}"'))
-                send_command(settings.X10_SERIAL, self.house, self.number, command)
+        Unit.dispatch_signal(self.house, self.number, command, multiplier, attempts, sleep_time)
 
         # send the command action out to the websocket
         send_command_status(self, command)
@@ -152,76 +148,293 @@ class Unit(models.Model):
         # save the state matching the on or off action
         if command in (Unit.ON_ACTION, Unit.OFF_ACTION):
             self.state = command == Unit.ON_ACTION
-            logger.debug(f'saving new state of "{self}": {self.state}')
-            self.save()
+            if persist:
+                logger.debug('saving new state of "%s": %s', self, self.state)
+                # only the state changed, so skip the full save and its signal
+                Unit.objects.filter(pk=self.pk).update(state=self.state)
+                invalidate_units_cache()
+                queue_unit_status(self)
         return status
 
-    def daily_events(self, current_time: datetime = now(), only_if_home: bool = False):
+    @staticmethod
+    def clean_command(command: str, dimmable: bool):
+        """Normalize and validate a command for a unit.
+
+        :param command: the command to send to the unit
+        :param dimmable: if the unit can be dimmed
+        :raises: InvalidSignalError
+        :returns: the lowercase command
+        """
+        # check if the command was valid, most callers already pass a lowercase command
+        if command not in Unit.ACTION_COMMANDS:
+            command = command.lower()
+        if command not in Unit.ACTION_COMMANDS:
+            logger.error('invalid command: "%s"', command)
+            raise InvalidSignalError(f'the command "{command}" does not exist')
+
+        # only allow bright or dim actions if the unit is dimmable
+        if command in Unit.DIMMER_COMMANDS and not dimmable:
+            logger.error('unit does not support the command: %s', command)
+            raise InvalidSignalError(f'the "{command}" command cannot be sent to this device')
+        return command
+
+    @staticmethod
+    def _transmit(house: str, number: int, command: str, multiplier: int):
+        """Send a command over the serial interface, the interface lock must already be held.
+
+        :param house: X10 house code
+        :param number: X10 unit number
+        :param command: the command to send
+        :param multiplier: the number of times to send the command
+        :raises: FirecrackerException
+        """
+        port = settings.X10_SERIAL
+        logger.debug('sending signal "%s" %s time(s) on "%s" to unit "%s" in house "%s"',
+                     command, multiplier, port, number, house)
+        send_commands(port, [build_command(house, number, command)] * multiplier)
+
+    @staticmethod
+    def dispatch_signal(house: str, number: int, command: str, multiplier: int=1,
+                        attempts: int=10, sleep_time: float=1.0):
+        """Send a command to an X10 address without loading or updating a unit.
+
+        The command is expected to be validated by clean_command.
+
+        :param house: X10 house code
+        :param number: X10 unit number
+        :param command: the command to send
+        :param multiplier: the number of times to send the command
+        :param attempts: max number of attempts to try grabbing the lock
+        :param sleep_time: the longest time to wait before checking the lock again
+        :raises: CacheLockException
+        :raises: FirecrackerException
+        """
+        with cache_lock('x10_interface', attempts, sleep_time=sleep_time):
+            Unit._transmit(house, number, command, multiplier)
+
+    @staticmethod
+    def dispatch_signals(signals, multiplier: int=1, attempts: int=10, sleep_time: float=1.0):
+        """Send commands to several X10 addresses while holding the interface lock once.
+
+        The commands are expected to be validated by clean_command. The serial port is opened
+        once for all of the commands. A command for an invalid address is logged and skipped,
+        while the rest are still sent.
+
+        :param signals: list of (house, number, command) tuples
+        :param multiplier: the number of times to send each command
+        :param attempts: max number of attempts to try grabbing the lock
+        :param sleep_time: the longest time to wait before checking the lock again
+        :raises: CacheLockException
+        :returns: list of whether each signal was sent, in order
+        """
+        # allow a couple of seconds for each command before the lock expires
+        expires = max(120, 2 * len(signals) * multiplier)
+
+        # build every command word first, so one bad address does not stop the others
+        sent = []
+        words = []
+        for house, number, command in signals:
+            try:
+                word = build_command(house, number, command)
+            except FirecrackerException as e:
+                logger.exception(e)
+                sent.append(False)
+            else:
+                words.extend([word] * multiplier)
+                sent.append(True)
+
+        if not words:
+            return sent
+
+        port = settings.X10_SERIAL
+        logger.debug('sending %d command(s) on "%s"', len(words), port)
+        with cache_lock('x10_interface', attempts, expires, sleep_time):
+            try:
+                send_commands(port, words)
+            except FirecrackerException as e:
+                logger.exception(e)
+                sent = [False] * len(signals)
+        return sent
+
+    @staticmethod
+    def send_signals(units, command: str=None, multiplier: int=1, attempts: int=10,
+                     sleep_time: float=1.0, group_houses: bool=False):
+        """Send a signal to several units while holding the interface lock once.
+
+        The command is validated for every unit before anything is sent. The new states of the
+        units that were sent an on or off command are saved with an update instead of saving
+        each unit, and are broadcast together.
+
+        :param units: list of Unit model instances, with at least the name, slug, house, number,
+                      state and dimmable fields loaded
+        :param command: the command to send to each unit, defaults to the state of each unit
+        :param multiplier: the number of times to send the command to each unit
+        :param attempts: max number of attempts to try grabbing the lock
+        :param sleep_time: the longest time to wait before checking the lock again
+        :param group_houses: send one all units off command for a house code instead of turning
+                             off each unit, when every unit with that house code is turned off
+        :raises: CacheLockException
+        :raises: InvalidSignalError
+        :returns: list of whether each unit was sent its command, in order
+        """
+        if not units:
+            return []
+
+        commands = []
+        for unit in units:
+            unit_command = command
+            if unit_command is None:
+                unit_command = Unit.ON_ACTION if unit.state else Unit.OFF_ACTION
+            commands.append(Unit.clean_command(unit_command, unit.dimmable))
+
+        if group_houses:
+            groups, signals = Unit._house_signals(units, commands)
+        else:
+            groups = [[i] for i in range(len(units))]
+            signals = [(unit.house, unit.number, unit_command)
+                       for unit, unit_command in zip(units, commands)]
+
+        sent = [False] * len(units)
+        results = Unit.dispatch_signals(signals, multiplier, attempts, sleep_time)
+        for members, was_sent in zip(groups, results):
+            for i in members:
+                sent[i] = was_sent
+
+        # send the command actions out to the websocket and group the units by their new state
+        states = {True: [], False: []}
+        for unit, unit_command, was_sent in zip(units, commands, sent):
+            if was_sent:
+                send_command_status(unit, unit_command)
+                if unit_command in (Unit.ON_ACTION, Unit.OFF_ACTION):
+                    unit.state = unit_command == Unit.ON_ACTION
+                    states[unit.state].append(unit.pk)
+
+        changed = states[True] + states[False]
+        if changed:
+            for state, pks in states.items():
+                if pks:
+                    Unit.objects.filter(pk__in=pks).update(state=state)
+            invalidate_units_cache()
+            queue_units_status(changed)
+        return sent
+
+    @staticmethod
+    def _house_signals(units, commands):
+        """Build the signals for a batch, turning off whole house codes with a single command.
+
+        :param units: list of Unit model instances
+        :param commands: the validated command for each unit
+        :returns: tuple of the unit indexes covered by each signal, and the list of signals
+        """
+        off = defaultdict(list)
+        for i, (unit, unit_command) in enumerate(zip(units, commands)):
+            if unit_command == Unit.OFF_ACTION:
+                off[unit.house].append(i)
+
+        # a house is only turned off at once when no other registered unit uses it
+        registered = Counter(Unit.objects.filter(house__in=list(off))
+                             .values_list('house', flat=True))
+        whole = {house for house, members in off.items()
+                 if len(members) > 1 and registered[house] == len(members)}
+
+        groups = [off[house] for house in whole]
+        signals = [(house, 'all', Unit.OFF_ACTION) for house in whole]
+        for i, (unit, unit_command) in enumerate(zip(units, commands)):
+            if unit_command != Unit.OFF_ACTION or unit.house not in whole:
+                groups.append([i])
+                signals.append((unit.house, unit.number, unit_command))
+        return groups, signals
+
+    @staticmethod
+    def schedule_prefetches():
+        """Get the lookups for prefetching the schedule constraints used by daily_events.
+
+        Pass these to prefetch_related when checking the schedules of several units, so the
+        constraints of all units are loaded in four queries. The constraints are stored in the
+        on_constraints, off_constraints, on_solar_constraints and off_solar_constraints lists.
+
+        :returns: list of Prefetch objects
+        """
+        return [
+            models.Prefetch('onscheduleconstraint_set',
+                            OnScheduleConstraint.objects.select_related('schedule'),
+                            to_attr='on_constraints'),
+            models.Prefetch('offscheduleconstraint_set',
+                            OffScheduleConstraint.objects.select_related('schedule'),
+                            to_attr='off_constraints'),
+            models.Prefetch('onsolarscheduleconstraint_set',
+                            OnSolarScheduleConstraint.objects.select_related('solarschedule'),
+                            to_attr='on_solar_constraints'),
+            models.Prefetch('offsolarscheduleconstraint_set',
+                            OffSolarScheduleConstraint.objects.select_related('solarschedule'),
+                            to_attr='off_solar_constraints'),
+        ]
+
+    def daily_events(self, current_time: datetime = None, only_if_home: bool = False):
         """Get times for all events in the current day.
 
-        :param current_time: the current time to check against
+        The schedule constraints are prefetched on the instance when the unit was not loaded with
+        schedule_prefetches.
+
+        :param current_time: the current time to check against, defaults to now
         :returns: a list of dicts containing event time and state (on/off)
         """
+        if current_time is None:
+            current_time = now()
+
         # get today's date only (remove time info)
-        current_time = current_time.astimezone(pytz.utc)
+        if current_time.tzinfo is not pytz.utc:
+            current_time = current_time.astimezone(pytz.utc)
         today = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        logger.debug(f'generating daily events for "{self}" at "{current_time}"')
+        logger.debug('generating daily events for "%s" at "%s"', self, current_time)
+
+        # does nothing for constraints that were already prefetched
+        models.prefetch_related_objects([self], *Unit.schedule_prefetches())
 
-        qs_filter = {}
-        if only_if_home:
-            qs_filter['if_home'] = True
+        def event_times(constraints, schedule_attr):
+            return [getattr(ev, schedule_attr).next_time(today) for ev in constraints
+                    if ev.if_home or not only_if_home]
 
         # get a list of all event times for today
-        on_dts = [ev.schedule.next_time(today) for ev in
-                  self.onscheduleconstraint_set.filter(**qs_filter)]
-        on_dts += [ev.solarschedule.next_time(today) for ev in
-                   self.onsolarscheduleconstraint_set.filter(**qs_filter)]
-        off_dts = [ev.schedule.next_time(today) for ev in
-                   self.offscheduleconstraint_set.filter(**qs_filter)]
-        off_dts += [ev.solarschedule.next_time(today) for ev in
-                    self.offsolarscheduleconstraint_set.filter(**qs_filter)]
-
-        # create a single list of events for the entire day
-        events = []
-        for dt in on_dts:
-            events.append({'time': dt, 'state': True})
-        for dt in off_dts:
-            events.append({'time': dt, 'state': False})
-
-        # sort the events by their time
-        events = sorted(events, key=lambda k: k['time'])
-        logger.debug(f'scheduled events for "{self}" for today: {events}')
+        on_dts = event_times(self.on_constraints, 'schedule')
+        on_dts += event_times(self.on_solar_constraints, 'solarschedule')
+        off_dts = event_times(self.off_constraints, 'schedule')
+        off_dts += event_times(self.off_solar_constraints, 'solarschedule')
+
+        # sort each list, then merge them into a single list of events for the entire day
+        # on events come before off events at the same time
+        on_dts.sort()
+        off_dts.sort()
+        events = [{'time': dt, 'state': state} for dt, state in heapq.merge(
+            ((dt, True) for dt in on_dts), ((dt, False) for dt in off_dts), key=itemgetter(0))]
+        logger.debug('scheduled events for "%s" for today: %s', self, events)
         return events
 
-    def intended_state(self, current_time: datetime = now(), only_if_home: bool = False):
+    def intended_state(self, current_time: datetime = None, only_if_home: bool = False):
         """Return the state the unit should be set to for the current time.
 
-        :param current_time: the current time to check against
+        :param current_time: the current time to check against, defaults to now
         :returns: the desired state based on the schedules.
         """
+        if current_time is None:
+            current_time = now()
+
         # get schedule of events for today
         # these are ordered by event time
         schedule = self.daily_events(current_time, only_if_home)
 
-        state = False
-        for ev in schedule:
-            logger.debug(f'checking {ev}')
-
-            # the event time occurs in the future
-            # break out of the loop, leaving the last known state
-            if ev['time'] >= current_time:
-                logger.debug((f'"{ev}" is past "{current_time}", using state for '
-                              f'unit "{self}": {state}'))
-                break
-
-            # set the state to represent the action
-            state = ev['state']
+        # find the last event before the current time, events at the current time have not
+        # happened yet
+        index = bisect_left([ev['time'] for ev in schedule], current_time)
+        state = schedule[index - 1]['state'] if index else False
+        logger.debug('using state for unit "%s" at "%s": %s', self, current_time, state)
         return state
 
     @staticmethod
     def post_save(sender, instance=None, created=False, **kwargs):
         """Send the serialized instance out to the websocket."""
-        send_unit_status(instance, created)
+        invalidate_units_cache()
+        queue_unit_status(instance, created)
 
 
 post_save.connect(Unit.post_save, sender=Unit)
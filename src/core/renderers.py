@@ -0,0 +1,27 @@
+"""JSON renderers for websocket messages."""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class SocketRenderer(JSONRenderer):
+    """Render socket messages with orjson when it is installed.
+
+    Types orjson does not know about are handed to the DRF encoder. Without orjson, this is the
+    regular DRF renderer. Either way non-ASCII characters are written as raw UTF-8.
+    """
+
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data to JSON bytes."""
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return bytes()
+        return orjson.dumps(data, default=self.encoder.default)
@@ -1,7 +1,8 @@
 """Core project channels routing."""
 from channels.routing import route
 
-from . import consumers
+from . import consumers, tasks
+from .actions import UNIT_BROADCAST_CHANNEL
 
 
 PATH = r'^/status/'
@@ -10,4 +11,6 @@ routes = [
     route('websocket.connect', consumers.ws_connect, path=PATH),
     route('websocket.receive', consumers.ws_receive, path=PATH),
     route('websocket.disconnect', consumers.ws_disconnect, path=PATH),
+    route(tasks.RUN_GROUP_CHANNEL, tasks.run_group_consumer),
+    route(UNIT_BROADCAST_CHANNEL, tasks.unit_broadcast_consumer),
 ]
@@ -1,9 +1,69 @@
 """Serializers for all models."""
+from collections import OrderedDict
+from collections.abc import Mapping
+from operator import attrgetter
+
+from django.db import models
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, RelatedField
 
 from . models import Scene, Schedule, SolarSchedule, Unit
 
 
+class FastListSerializer(serializers.ListSerializer):
+    """List serializer that reads plain attributes without the generic field lookup.
+
+    Whether a field can be read with a simple getattr is decided once from the first row, then
+    reused for every other row. Relations, nested serializers, and anything needing a dotted or
+    callable source still use the field's own get_attribute.
+    """
+
+    @staticmethod
+    def _fast_getter(field, instance):
+        """Get an attribute getter for the field, or None if the field needs the slow path."""
+        if isinstance(field, (RelatedField, ManyRelatedField, serializers.BaseSerializer)):
+            return None
+        if len(field.source_attrs) != 1 or isinstance(instance, Mapping):
+            return None
+
+        getter = attrgetter(field.source_attrs[0])
+        try:
+            value = getter(instance)
+        except AttributeError:
+            return None
+        return None if callable(value) else getter
+
+    def to_representation(self, data):
+        """List of object instances -> List of dicts of primitive datatypes."""
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        fields = self.child._readable_fields
+        getters = None
+
+        ret = []
+        for item in iterable:
+            if getters is None:
+                getters = [self._fast_getter(field, item) for field in fields]
+
+            row = OrderedDict()
+            for field, getter in zip(fields, getters):
+                if getter is not None:
+                    attribute = getter(item)
+                else:
+                    try:
+                        attribute = field.get_attribute(item)
+                    except SkipField:
+                        continue
+
+                check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+                if check_for_none is None:
+                    row[field.field_name] = None
+                else:
+                    row[field.field_name] = field.to_representation(attribute)
+            ret.append(row)
+        return ret
+
+
 class UnitSerializer(serializers.ModelSerializer):
     """Serializer for Unit models."""
 
@@ -12,6 +72,7 @@ class UnitSerializer(serializers.ModelSerializer):
 
         model = Unit
         fields = '__all__'
+        list_serializer_class = FastListSerializer
 
 
 class SceneSerializer(serializers.ModelSerializer):
@@ -22,6 +83,7 @@ class SceneSerializer(serializers.ModelSerializer):
 
         model = Scene
         fields = '__all__'
+        list_serializer_class = FastListSerializer
 
     units = serializers.SlugRelatedField(queryset=Unit.objects.all(), many=True,
                                          slug_field='slug')
@@ -35,6 +97,7 @@ class ScheduleSerializer(serializers.ModelSerializer):
 
         model = Schedule
         fields = '__all__'
+        list_serializer_class = FastListSerializer
 
 
 class SolarScheduleSerializer(serializers.ModelSerializer):
@@ -45,6 +108,7 @@ class SolarScheduleSerializer(serializers.ModelSerializer):
 
         model = SolarSchedule
         fields = '__all__'
+        list_serializer_class = FastListSerializer
 
 
 class CommandSerializer(serializers.Serializer):
@@ -0,0 +1,66 @@
+"""Background tasks run by the channels workers."""
+import logging
+
+from channels import Channel
+
+from x10.lock import CacheLockException
+from .actions import send_units_batch
+from .models import InvalidSignalError, Unit
+
+logger = logging.getLogger(__name__)
+
+RUN_GROUP_CHANNEL = 'x10.run-group'
+
+
+def run_group(slugs, action, multiplier=1):
+    """Queue a command to be sent to a group of units by a worker.
+
+    :param slugs: the slugs of the units to send the command to
+    :param action: the command to send to each unit
+    :param multiplier: the number of times to send the command to each unit
+    """
+    slugs = list(slugs)
+    logger.debug('queueing "%s" for units: %s', action, slugs)
+    Channel(RUN_GROUP_CHANNEL).send({
+        'slugs': slugs,
+        'action': action,
+        'multiplier': multiplier
+    })
+
+
+def run_group_consumer(message):
+    """Send a queued command to each unit in the group.
+
+    Only the columns needed to address each unit are loaded. All commands are sent while holding
+    the interface lock once, then on and off states are saved with a single update.
+    """
+    multiplier = message.content.get('multiplier', 1)
+    try:
+        action = Unit.clean_command(message.content['action'], True)
+    except InvalidSignalError as e:
+        logger.exception(e)
+        return
+
+    units = Unit.objects.filter(slug__in=message.content['slugs'])
+    if action in Unit.DIMMER_COMMANDS:
+        # skip units that cannot be dimmed instead of failing the whole group
+        units = units.filter(dimmable=True)
+    units = list(units.only('name', 'slug', 'house', 'number', 'state', 'dimmable'))
+
+    logger.debug('sending "%s" to units: %s', action, units)
+    try:
+        Unit.send_signals(units, action, multiplier)
+    except CacheLockException as e:
+        logger.exception(e)
+
+
+def unit_broadcast_consumer(message):
+    """Send queued unit changes to the websocket as one batch.
+
+    Bursts of changes, such as a scene switching all of its units, are already merged into one
+    message by the sender, so each message is sent on as it arrives. Each unit is sent with its
+    latest saved state.
+    """
+    units = message.content['units']
+    created = [pk for pk, was_created in units if was_created]
+    send_units_batch(Unit.objects.filter(pk__in=[pk for pk, _ in units]), created)
@@ -1,2 +1,90 @@
-"""TODO."""
-# from django.test import TestCase
+"""Tests for the core app."""
+from datetime import datetime
+
+from django.test import override_settings, SimpleTestCase
+import pytz
+
+from core.management.commands.cron import Command
+from core.models import Schedule
+from x10.interface import build_command, FirecrackerException
+
+
+def utc(*args):
+    """Create a UTC datetime."""
+    return datetime(*args, tzinfo=pytz.utc)
+
+
+class ScheduleNextTimeTests(SimpleTestCase):
+    """Crontab entries are in local time, but next times are in UTC."""
+
+    def test_local_time_zones(self):
+        """The next time is the next local match, whatever the zone's offset."""
+        schedule = Schedule(crontab='*/5 * * * *')
+        for tz in ('UTC', 'Europe/Berlin', 'Asia/Tokyo', 'America/New_York'):
+            with self.subTest(tz=tz), override_settings(TIME_ZONE=tz):
+                self.assertEqual(schedule.next_time(utc(2026, 1, 15, 12, 1)),
+                                 utc(2026, 1, 15, 12, 5))
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_daylight_saving_offset(self):
+        """The offset in effect on the event date is used."""
+        schedule = Schedule(crontab='0 3 * * *')
+        self.assertEqual(schedule.next_time(utc(2026, 1, 15)), utc(2026, 1, 15, 8))
+        self.assertEqual(schedule.next_time(utc(2026, 7, 15)), utc(2026, 7, 15, 7))
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_always_moves_forward(self):
+        """Chaining next times never goes back in time."""
+        schedule = Schedule(crontab='*/5 * * * *')
+        event_time = utc(2026, 1, 15, 12, 1)
+        for _ in range(20):
+            next_time = schedule.next_time(event_time)
+            self.assertGreater(next_time, event_time)
+            event_time = next_time
+
+
+class CronQueueTests(SimpleTestCase):
+    """Events pushed to the cron queue."""
+
+    def setUp(self):
+        """Create a command to push events with."""
+        self.command = Command()
+        self.command.tz = pytz.utc
+        self.command.counter = iter(range(100))
+
+    def test_push_after(self):
+        """Events that are not later than the given time are dropped."""
+        queue = []
+        schedule = Schedule(crontab='*/5 * * * *')
+        constraint = type('Constraint', (), {'schedule': schedule, 'unit': 'unit'})()
+        start_time = utc(2026, 1, 15, 12)
+
+        self.command.push(queue, start_time, constraint, 'on', after=start_time)
+        self.assertEqual(queue, [])
+
+        self.command.push(queue, utc(2026, 1, 15, 12, 5), constraint, 'on', after=start_time)
+        self.assertEqual(len(queue), 1)
+
+
+class BuildCommandTests(SimpleTestCase):
+    """Command words sent to the Firecracker, from the CM17A protocol."""
+
+    def test_unit_codes(self):
+        """Each unit code is added to the house code."""
+        self.assertEqual(build_command('M', 1, 'on'), 0x0000)
+        self.assertEqual(build_command('M', 1, 'off'), 0x0020)
+        self.assertEqual(build_command('M', 12, 'on'), 0x0418)
+        self.assertEqual(build_command('M', 16, 'on'), 0x0458)
+        self.assertEqual(build_command('a', 16, 'off'), 0x6478)
+
+    def test_group_command(self):
+        """Group commands only use the house code."""
+        self.assertEqual(build_command('M', 'all', 'off'), 0x0080)
+
+    def test_invalid_codes(self):
+        """Unknown houses and units out of range are rejected."""
+        with self.assertRaises(FirecrackerException):
+            build_command('Q', 1, 'on')
+        for unit in (0, 17):
+            with self.subTest(unit=unit), self.assertRaises(FirecrackerException):
+                build_command('M', unit, 'on')
@@ -0,0 +1,15 @@
+"""Request throttles for rest framework."""
+from django.core.cache import caches
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+class LocalAnonRateThrottle(AnonRateThrottle):
+    """Anonymous rate throttle that keeps request history in the throttle cache."""
+
+    cache = caches['throttle']
+
+
+class LocalUserRateThrottle(UserRateThrottle):
+    """User rate throttle that keeps request history in the throttle cache."""
+
+    cache = caches['throttle']
@@ -2,6 +2,8 @@
 import logging
 
 from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from django.utils.timezone import now
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
 from rest_framework.decorators import detail_route, list_route
@@ -10,7 +12,8 @@ from rest_framework.response import Response
 
 from x10.interface import FirecrackerException
 from x10.lock import CacheLockException
-from .models import InvalidSignalError, RealPerson, Scene, Schedule, SolarSchedule, Unit
+from .models import (InvalidSignalError, OnScheduleConstraint, OnSolarScheduleConstraint,
+                     RealPerson, Scene, Schedule, SolarSchedule, Unit)
 from .serializers import (CommandSerializer, SceneSerializer, ScheduleSerializer,
                           SolarScheduleSerializer, UnitSerializer)
 
@@ -33,6 +36,15 @@ class UnitViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filter_fields = ('dimmable', 'state')
 
+    def get_queryset(self):
+        """Prefetch the schedule relations listed by the serializer."""
+        queryset = super(UnitViewSet, self).get_queryset()
+        if self.action == 'signal':
+            # only the state is returned after sending a signal
+            return queryset
+        return queryset.prefetch_related('on_schedules', 'off_schedules', 'on_solar_schedules',
+                                         'off_solar_schedules')
+
     @detail_route(methods=['POST'])
     def signal(self, request, slug=None):
         """Child view to send a command to the unit."""
@@ -59,6 +71,14 @@ class SceneViewSet(viewsets.ModelViewSet):
     serializer_class = SceneSerializer
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        """Prefetch the units listed by the serializer."""
+        queryset = super(SceneViewSet, self).get_queryset()
+        if self.action == 'signal':
+            # the units are loaded when sending the signal
+            return queryset
+        return queryset.prefetch_related('units')
+
     @detail_route(methods=['POST'])
     def signal(self, request, slug=None):
         """Child view to send a command to the scene."""
@@ -113,22 +133,28 @@ class PersonViewSet(viewsets.ViewSet):
 
         # save the state that someone is home
         RealPerson.leave()
-        logger.debug(f'real person has left')
+        logger.debug('real person has left')
 
         # save lights currently turned on
-        on_units = Unit.objects.filter(state=True, auto_managed=True)
+        on_units = list(Unit.objects.filter(state=True, auto_managed=True)
+                        .only('name', 'slug', 'house', 'number', 'state', 'dimmable'))
         on_units_slugs = [u.slug for u in on_units]
         cache.set(PersonViewSet.KEY, on_units_slugs, None)
-        logger.debug(f'previously on units: {on_units_slugs}')
+        logger.debug('previously on units: %s', on_units_slugs)
+
+        # turn off all lights while holding the interface lock once, a house code with only these
+        # units is turned off with a single command
+        try:
+            sent = Unit.send_signals(on_units, Unit.OFF_ACTION, group_houses=True)
+        except CacheLockException:
+            raise ServiceUnavailable
 
-        # turn off all lights
-        for unit in on_units:
-            try:
-                unit.send_signal(Unit.OFF_ACTION)
+        for unit, was_sent in zip(on_units, sent):
+            if was_sent:
                 log.append(f'Turned {unit} off')
-                logger.info(f'turning {unit} off')
-            except (CacheLockException, FirecrackerException):
-                raise ServiceUnavailable
+                logger.info('turning %s off', unit)
+        if not all(sent):
+            raise ServiceUnavailable
 
         return Response({
             'message': 'Have a nice day!',
@@ -150,32 +176,44 @@ class PersonViewSet(viewsets.ViewSet):
 
         # get the current time and any units that were on when someone left
         previously_on_units = cache.get(PersonViewSet.KEY, [])
-        logger.debug(f'previously on units: {previously_on_units}')
+        logger.debug('previously on units: %s', previously_on_units)
 
         # turn on units that were on when last left
-        for slug in previously_on_units:
-            try:
-                unit = Unit.objects.get(slug=slug)
-            except Unit.DoesNotExist:
-                logger.warn(f'{slug} does not exist, skipping')
-            else:
-                try:
-                    unit.send_signal(Unit.ON_ACTION)
-                    log.append(f'Turned {unit} back on')
-                    logger.info(f'turning {unit} back on')
-                except (CacheLockException, FirecrackerException):
-                    raise ServiceUnavailable
+        fields = ('name', 'slug', 'house', 'number', 'state', 'dimmable')
+        units = list(Unit.objects.filter(slug__in=previously_on_units).only(*fields))
+        for slug in set(previously_on_units) - {unit.slug for unit in units}:
+            logger.warning('%s does not exist, skipping', slug)
+        messages = [f'Turned {unit} back on' for unit in units]
 
         # turn on units that fall within their scheduled on times
-        managed_units = Unit.objects.filter(state=False, auto_managed=True)
-        for unit in managed_units.all():
-            if unit.intended_state(only_if_home=True):
-                try:
-                    unit.send_signal(Unit.ON_ACTION)
-                    log.append(f'Turned {unit} on due to a scheduled event')
-                    logger.info('turned {unit} on due to an intended state')
-                except (CacheLockException, FirecrackerException):
-                    raise ServiceUnavailable
+        # every unit is checked at the same time, so shared schedules reuse their cached times
+        current_time = now()
+        # only units with an on schedule used when someone is home can be intended to be on
+        has_on = OnScheduleConstraint.objects.filter(unit=OuterRef('pk'), if_home=True)
+        has_solar_on = OnSolarScheduleConstraint.objects.filter(unit=OuterRef('pk'), if_home=True)
+        managed_units = (Unit.objects.filter(state=False, auto_managed=True)
+                         .exclude(slug__in=previously_on_units)
+                         .annotate(has_on=Exists(has_on), has_solar_on=Exists(has_solar_on))
+                         .filter(Q(has_on=True) | Q(has_solar_on=True))
+                         .only(*fields)
+                         .prefetch_related(*Unit.schedule_prefetches()))
+        for unit in managed_units:
+            if unit.intended_state(current_time, only_if_home=True):
+                units.append(unit)
+                messages.append(f'Turned {unit} on due to a scheduled event')
+
+        # send all of the signals while holding the interface lock once
+        try:
+            sent = Unit.send_signals(units, Unit.ON_ACTION)
+        except CacheLockException:
+            raise ServiceUnavailable
+
+        for unit, message, was_sent in zip(units, messages, sent):
+            if was_sent:
+                log.append(message)
+                logger.info('turning %s on', unit)
+        if not all(sent):
+            raise ServiceUnavailable
 
         return Response({
             'message': 'Welcome home!',
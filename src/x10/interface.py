@@ -39,6 +39,7 @@ Modified for PEP8 and Python 3 compatibility. Original text:
       ftp://ftp.x10.com/pub/manuals/cm17a_protocol.txt
 
 """
+import atexit
 import time
 
 import serial
@@ -49,6 +50,9 @@ DELAY_BIT = 0.001  # Seconds between bits
 DELAY_INIT = 0.15  # Powerup delay (default of 0.5)
 DELAY_FIN = 0.5    # Seconds to wait before disabling after transmit (default of 1.0)
 
+# Serial ports kept open between commands, keyed by port name
+_ports = {}
+
 # House and unit code table
 HOUSES = (
     (0x6000, 'a'),
@@ -83,7 +87,7 @@ UNITS = (
     (0x0400, 9),
     (0x0410, 10),
     (0x0408, 11),
-    (0x0400, 12),
+    (0x0418, 12),
     (0x0440, 13),
     (0x0450, 14),
     (0x0448, 15),
@@ -107,6 +111,22 @@ CMD_LAMPS_OFF = 0x0084
 DATA_HDR = 0xD5AA
 DATA_FTR = 0xAD
 
+# Lookup tables for build_command, keyed by uppercase names
+HOUSE_CODES = {label.upper(): code for code, label in HOUSES}
+ACTION_CODES = {
+    'ON': CMD_ON,
+    'OFF': CMD_OFF,
+    'BRT': CMD_BRT,
+    'DIM': CMD_DIM,
+    'ALL_ON': CMD_ALL_ON,
+    'ALL_OFF': CMD_ALL_OFF,
+    'LAMPS_ON': CMD_LAMPS_ON,
+    'LAMPS_OFF': CMD_LAMPS_OFF,
+}
+# Bright and dim apply to the last addressed unit, so no unit code is added
+UNITLESS_ACTIONS = frozenset(('BRT', 'DIM'))
+GROUP_UNITS = frozenset(('ALL', 'LAMPS'))
+
 
 class FirecrackerException(Exception):
     """Represents any exception with calling the firecracker."""
@@ -126,99 +146,136 @@ def set_off(s):
     s.setRTS(False)
 
 
-def send_data(s, data, bytes):
-    """Send data to firecracker."""
-    mask = 1 << (bytes - 1)
+def data_bits(data, bytes):
+    """Split data into its bits, most significant first."""
+    return tuple(bool(data >> shift & 1) for shift in range(bytes - 1, -1, -1))
+
+
+# Header and footer bits, sent around every command
+HDR_BITS = data_bits(DATA_HDR, 16)
+FTR_BITS = data_bits(DATA_FTR, 8)
+
 
-    for i in range(bytes):
-        bit = data & mask
-        if bit == mask:
-            s.setDTR(False)
-        elif bit == 0:
-            s.setRTS(False)
+def send_bits(s, bits):
+    """Send bits to firecracker, a one drops DTR and a zero drops RTS."""
+    set_dtr, set_rts = s.setDTR, s.setRTS
 
+    for bit in bits:
+        set_line = set_dtr if bit else set_rts
+        set_line(False)
         time.sleep(DELAY_BIT)
-        set_standby(s)
+        # Only the dropped line needs to be raised again to return to standby
+        set_line(True)
         # Then stay in standby at least 0.5ms before next bit
         time.sleep(DELAY_BIT)
-        # Move to next bit in sequence
-        data = data << 1
+
+
+def send_data(s, data, bytes):
+    """Send data to firecracker."""
+    send_bits(s, data_bits(data, bytes))
 
 
 def build_command(house, unit, action):
     """Generate the command word."""
-    cmd = 0x00000000
-    house_int = ord(house.upper()) - ord('A')
-
-    # Add in the house code
-    if house_int >= 0 and house_int <= ord('P') - ord('A'):
-        cmd = cmd | HOUSE_LIST[house_int]
-    else:
-        raise FirecrackerException(f'Invalid house code: {house} {house_int}')
+    try:
+        cmd = HOUSE_CODES[house.upper()]
+    except (AttributeError, KeyError):
+        raise FirecrackerException(f'Invalid house code: {house}')
 
     # Add in the unit code. Ignore if bright or dim command,
     # which just applies to last unit.
-    if str(unit).upper() == 'ALL' or str(unit).upper() == 'LAMPS':
-        action = unit + '_' + action
+    action = action.upper()
+    if str(unit).upper() in GROUP_UNITS:
+        action = str(unit).upper() + '_' + action
     else:
         unit = int(unit)
 
-        if unit > 0 and unit < MAX_UNIT:
-            if action.upper() != 'BRT' and action.upper() != 'DIM':
+        if 0 < unit <= MAX_UNIT:
+            if action not in UNITLESS_ACTIONS:
                 cmd = cmd | UNIT_LIST[unit - 1]
         else:
             raise FirecrackerException(f'Invalid unit code: {unit}')
 
     # Add the action code
-    if action.upper() == 'ON':
-        cmd = cmd | CMD_ON
-    elif action.upper() == 'OFF':
-        cmd = cmd | CMD_OFF
-    elif action.upper() == 'BRT':
-        cmd = cmd | CMD_BRT
-    elif action.upper() == 'DIM':
-        cmd = cmd | CMD_DIM
-    elif action.upper() == 'ALL_ON':
-        cmd = cmd | CMD_ALL_ON
-    elif action.upper() == 'ALL_OFF':
-        cmd = cmd | CMD_ALL_OFF
-    elif action.upper() == 'LAMPS_ON':
-        cmd = cmd | CMD_LAMPS_ON
-    elif action.upper() == 'LAMPS_OFF':
-        cmd = cmd | CMD_LAMPS_OFF
-    else:
+    try:
+        return cmd | ACTION_CODES[action]
+    except KeyError:
         raise FirecrackerException(f'Invalid action code: {action}')
 
-    return cmd
 
-
-def send_command(portname, house, unit, action):
-    """Send Command to Firecracker.
-
-    :param portname: Serial port to send to
-    :param house: house code, character 'a' to 'p'
-    :param unit: unit code, integer 1 to 16
-    :param action: string 'ON', 'OFF', 'BRT' or 'DIM'
-    """
-    cmd = build_command(house, unit, action)
-    if cmd is not None:
+def _open_port(portname):
+    """Get the open serial port, opening it on first use."""
+    s = _ports.get(portname)
+    if s is None or not s.is_open:
         try:
             s = serial.Serial(portname)
         except serial.SerialException:
             raise FirecrackerException(f'Error opening serial port: {portname}')
+        _ports[portname] = s
+    return s
 
+
+def _discard_port(portname):
+    """Close a serial port and forget it, ignoring errors from a device that is gone."""
+    s = _ports.pop(portname, None)
+    if s is not None:
+        try:
+            s.close()
+        except (serial.SerialException, OSError):
+            pass
+
+
+def close_ports():
+    """Close every serial port kept open between commands."""
+    for portname in list(_ports):
+        _discard_port(portname)
+
+
+atexit.register(close_ports)
+
+
+def send_commands(portname, commands):
+    """Send several command words to the Firecracker while the serial port is open.
+
+    The Firecracker is powered up once, instead of once for every command. Each command still
+    waits for the Firecracker to finish transmitting before the next one is sent. The port is
+    kept open for the next call; callers must hold the interface lock.
+
+    :param portname: Serial port to send to
+    :param commands: command words, as returned by build_command
+    """
+    s = _open_port(portname)
+
+    try:
         # Initialize the firecracker
         set_standby(s)
         # Make sure it powers up
         time.sleep(DELAY_INIT)
-        # Send data header
-        send_data(s, DATA_HDR, 16)
-        # Send data
-        send_data(s, cmd, 16)
-        # Send footer
-        send_data(s, DATA_FTR, 8)
-        # Wait for firecracker to finish transmitting
-        time.sleep(DELAY_FIN)
+        for cmd in commands:
+            # Send data header
+            send_bits(s, HDR_BITS)
+            # Send data
+            send_data(s, cmd, 16)
+            # Send footer
+            send_bits(s, FTR_BITS)
+            # Wait for firecracker to finish transmitting
+            time.sleep(DELAY_FIN)
         # Shut off the firecracker
         set_off(s)
-        s.close()
+    except (serial.SerialException, OSError):
+        # the device may have been unplugged, open it again on the next call
+        _discard_port(portname)
+        raise FirecrackerException(f'Error writing to serial port: {portname}')
+
+
+def send_command(portname, house, unit, action):
+    """Send Command to Firecracker.
+
+    :param portname: Serial port to send to
+    :param house: house code, character 'a' to 'p'
+    :param unit: unit code, integer 1 to 16
+    :param action: string 'ON', 'OFF', 'BRT' or 'DIM'
+    """
+    cmd = build_command(house, unit, action)
+    if cmd is not None:
+        send_commands(portname, [cmd])
@@ -1,12 +1,18 @@
 """Locking mechanisms using a central cache for running critical sections of code."""
 import contextlib
 import logging
+import random
+import secrets
+import threading
 import time
 
 from django.core.cache import cache as django_cache
 
 logger = logging.getLogger(__name__)
 
+# locks for each key within this process, so threads wait on each other without polling the cache
+_local_locks = {}
+
 
 class CacheLockException(Exception):
     """Exception for when a lock is failed."""
@@ -15,7 +21,8 @@ class CacheLockException(Exception):
 
 
 @contextlib.contextmanager
-def cache_lock(key, attempts: int=1, expires: int=120, sleep_time: float=1.0):
+def cache_lock(key, attempts: int=1, expires: int=120, sleep_time: float=1.0,
+               base_sleep: float=0.05):
     """Context manager that holds a lock in the cache.
 
     Use as follows:
@@ -28,38 +35,69 @@ def cache_lock(key, attempts: int=1, expires: int=120, sleep_time: float=1.0):
     :param key: the cache key to use for the lock
     :param attempts: max number of attempts to try grabbing the lock
     :param expires: when the lock expires, seconds
-    :param sleep_time: how long to wait before checking the lock again, seconds
+    :param sleep_time: the longest time to wait before checking the lock again, seconds
+    :param base_sleep: how long to wait after the first attempt, doubled for each attempt
     """
     key = f'__d_lock_{key}'
 
-    got_lock = False
+    # the longest time that would be spent sleeping between attempts
+    wait = sum(min(sleep_time, base_sleep * (2 ** i)) for i in range(attempts - 1))
+    deadline = time.monotonic() + wait
+
+    local_lock = _local_locks.setdefault(key, threading.Lock())
+    if not local_lock.acquire(timeout=wait):
+        raise CacheLockException(f'Could not acquire lock for {key}')
+
     try:
-        got_lock = _acquire_lock(key, attempts, expires, sleep_time)
-        yield
+        token = _acquire_lock(key, attempts, expires, sleep_time, base_sleep, deadline)
+        try:
+            yield
+        finally:
+            _release_lock(key, token)
     finally:
-        if got_lock:
-            _release_lock(key)
+        local_lock.release()
 
 
-def _acquire_lock(key: str, attempts: int, expires: int, sleep_time: float):
+def _acquire_lock(key: str, attempts: int, expires: int, sleep_time: float, base_sleep: float,
+                  deadline: float):
     """Try to acquire the lock.
 
+    Waits between attempts back off exponentially up to sleep_time, with jitter so that waiting
+    processes do not all retry at the same moment. No more attempts are made after the deadline.
+
     :param key: the cache key to acquire
     :param attempts: max number of attempts to try grabbing the lock
     :param expires: when the lock expires, seconds
-    :param sleep_time: how long to wait before checking the lock again, seconds
+    :param sleep_time: the longest time to wait before checking the lock again, seconds
+    :param base_sleep: how long to wait after the first attempt, seconds
+    :param deadline: time.monotonic() value after which no more attempts are made
     :raises CacheLockException: if the number of attempts has been reached
+    :returns: the token identifying this holder of the lock
     """
+    token = secrets.token_hex(16)
     for i in range(0, attempts):
-        stored = django_cache.add(key, 1, expires)
+        stored = django_cache.add(key, token, expires)
         if stored:
-            return True
-        if i != attempts-1:
-            logger.debug(f'sleeping for {sleep_time} while trying to acquire key: {key}')
-            time.sleep(sleep_time)
+            return token
+        remaining = deadline - time.monotonic()
+        if i == attempts - 1 or remaining <= 0:
+            break
+        delay = min(sleep_time, base_sleep * (2 ** i), remaining) * random.uniform(0.5, 1.0)
+        logger.debug('sleeping for %s while trying to acquire key: %s', delay, key)
+        time.sleep(delay)
     raise CacheLockException(f'Could not acquire lock for {key}')
 
 
-def _release_lock(key):
-    """Release the lock by deleting the key from the cache."""
-    django_cache.delete(key)
+def _release_lock(key: str, token: str):
+    """Release the lock by deleting the key from the cache.
+
+    The key is only deleted while it still holds this token. When the lock expired during the
+    critical section and another process took it, that process keeps its lock.
+
+    :param key: the cache key to release
+    :param token: the token returned when the lock was acquired
+    """
+    if django_cache.get(key) == token:
+        django_cache.delete(key)
+    else:
+        logger.warning('lock %s expired before it was released', key)
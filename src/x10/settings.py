@@ -1,24 +1,10 @@
 """Main project settings."""
-from __future__ import absolute_import
+from importlib.util import find_spec
+import os
 
 from django.core.exceptions import ImproperlyConfigured
 import environ
 
-try:
-    import debug_toolbar
-except ImportError:
-    debug_toolbar = None
-
-try:
-    import asgi_redis
-except ImportError:
-    asgi_redis = None
-
-try:
-    import asgi_ipc
-except ImportError:
-    asgi_ipc = None
-
 
 # inner project dir (manage.py)
 base_dir = environ.Path(__file__) - 1
@@ -32,9 +18,11 @@ ROOT_DIR = root_dir()
 data_dir = root_dir.path('data')
 DATA_DIR = data_dir()
 
-# load default environment from file
+# load default environment from file, unless it is already provided by the process manager
 env = environ.Env(DEBUG=(bool, False),)
-environ.Env.read_env(root_dir.path('.env')())
+env_file = root_dir.path('.env')()
+if not env.bool('DJANGO_SKIP_DOTENV', default=False) and os.path.isfile(env_file):
+    environ.Env.read_env(env_file)
 
 
 '''
@@ -42,7 +30,7 @@ Base settings
 '''
 DEBUG = env('DEBUG')
 SECRET_KEY = env('SECRET_KEY')
-INTERNAL_IPS = env.list('INTERNAL_IPS', default=[])
+INTERNAL_IPS = frozenset(env.list('INTERNAL_IPS', default=[]))
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', default=[])
 HTTPS_ONLY = env.bool('HTTPS_ONLY', default=False)
 WSGI_APPLICATION = 'x10.wsgi.application'
@@ -61,7 +49,6 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.sites',
 
-    'cachalot',
     'health_check',
     'health_check.db',
     'health_check.cache',
@@ -83,9 +70,7 @@ INSTALLED_APPS = [
 Database and cache
 '''
 DATABASES = {
-    'default': env.db(
-        default='sqlite:///{}'.format(data_dir('run', 'db.sqlite3'))
-    )
+    'default': env.db(default=f"sqlite:///{data_dir('run', 'db.sqlite3')}")
 }
 
 CACHES = {
@@ -97,8 +82,18 @@ CACHES = {
             'MAX_ENTRIES': 1000
         }
     },
+    # request history for rate throttling, kept in each process
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
 }
 CACHALOT_ENABLED = env.bool('CACHALOT_ENABLED', default=not DEBUG)
+if CACHALOT_ENABLED:
+    # skip loading cachalot and its query patches entirely when it is off
+    INSTALLED_APPS += ['cachalot']
+# every signal rewrites unit state, so cached unit queries would be thrown away right after
+CACHALOT_UNCACHABLE_TABLES = ('django_migrations', 'core_unit')
 
 
 '''
@@ -115,12 +110,13 @@ CHANNEL_LAYERS = {
 }
 CHANNELS_REDIS_HOST = env.list('CHANNELS_REDIS_HOST', default=[])
 
-if asgi_redis is not None and len(CHANNELS_REDIS_HOST):
+# only probe for the optional layers, they are imported by channels when used
+if len(CHANNELS_REDIS_HOST) and find_spec('asgi_redis') is not None:
     CHANNEL_LAYERS['default']['BACKEND'] = 'asgi_redis.RedisChannelLayer'
     CHANNEL_LAYERS['default']['CONFIG'] = {
         'hosts': CHANNELS_REDIS_HOST
     }
-elif asgi_ipc is not None:
+elif find_spec('asgi_ipc') is not None:
     CHANNEL_LAYERS['default']['BACKEND'] = 'asgi_ipc.IPCChannelLayer'
 else:
     # in-memory layer does not work across processes
@@ -130,7 +126,7 @@ else:
 '''
 Authentication
 '''
-AUTH_PASSWORD_VALIDATORS = [
+AUTH_PASSWORD_VALIDATORS = (
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
     },
@@ -143,7 +139,7 @@ AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
-]
+)
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
 )
@@ -187,14 +183,7 @@ TEMPLATES = [
         },
     },
 ]
-if not DEBUG:
-    TEMPLATES[0]['OPTIONS']['loaders'] = [
-        ('django.template.loaders.cached.Loader', [
-            'django.template.loaders.filesystem.Loader',
-            'django.template.loaders.app_directories.Loader',
-        ]),
-    ]
-    TEMPLATES[0]['APP_DIRS'] = False
+# without explicit loaders, Django wraps the app loaders in the cached loader when not debugging
 
 
 '''
@@ -232,7 +221,11 @@ CSRF_COOKIE_SECURE = HTTPS_ONLY
 '''
 Session
 '''
-SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# only auth state is stored, which fits in a cookie and saves a cache or db hit per request
+SESSION_ENGINE = env.str('SESSION_ENGINE',
+                         default='django.contrib.sessions.backends.signed_cookies')
+# channels keeps websocket sessions per reply channel, which cannot be held in a cookie
+CHANNEL_SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_COOKIE_DOMAIN = env.str('SESSION_COOKIE_DOMAIN', default=None)
 SESSION_COOKIE_NAME = env.str('SESSION_COOKIE_NAME', default='session')
 SESSION_COOKIE_SECURE = HTTPS_ONLY
@@ -241,7 +234,7 @@ SESSION_COOKIE_SECURE = HTTPS_ONLY
 '''
 Debug
 '''
-if debug_toolbar is not None:
+if DEBUG and find_spec('debug_toolbar') is not None:
     INSTALLED_APPS += ['debug_toolbar']
     MIDDLEWARE.insert(0, 'debug_toolbar.middleware.DebugToolbarMiddleware')
 
@@ -264,8 +257,8 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
     'DEFAULT_THROTTLE_CLASSES': (
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'core.throttling.LocalAnonRateThrottle',
+        'core.throttling.LocalUserRateThrottle'
     ),
     'DEFAULT_THROTTLE_RATES': {
         'anon': '2/second',
@@ -2,7 +2,14 @@
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.template import engines
+from django.urls import get_resolver
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "x10.settings")
 
 application = get_wsgi_application()
+
+# load the urlconf and template engines now instead of on the first request, so that workers
+# forked from a preloaded application share them
+get_resolver().url_patterns
+engines.all()